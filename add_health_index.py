@@ -5,105 +5,278 @@ The index is generated in a controlled way for demonstration purposes.
 """
 
 import csv
+import mmap
+import os
 import random
 import math
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
 from pathlib import Path
-from statistics import mean
 
+# Creates spatial patterns (central area healthier, edges less healthy)
+# Approximate center of the flight area (adjust if needed)
+CENTER_LAT = 50.329
+CENTER_LON = 11.939
+EARTH_RADIUS = 6371000  # mean radius in meters
 
-def generate_health_index(latitude, longitude, relative_altitude, frame_index, video_name):
+# Seed of the gaussian variation (fixed to keep runs reproducible)
+HEALTH_SEED = 42
+
+# Rows processed per batch when streaming the CSV
+CHUNK_SIZE = 65536
+
+# Chunks computed ahead of the writer (bounds memory use)
+MAX_PENDING_CHUNKS = 2 * (os.cpu_count() or 1)
+
+
+def generate_health_index(latitude, longitude, relative_altitude):
     """
     Generates a dummy health index (0–100%) based on spatial patterns.
     Uses latitude/longitude to create zones with different health levels.
+    The gaussian variation comes from a generator seeded by the position,
+    so each point gets its own variation (the same one on every call).
     """
-    # Seed based on position to ensure consistency
-    seed = int(abs(latitude * 10000) + abs(longitude * 10000))
-    random.seed(seed)
-    
-    # Creates spatial patterns (central area healthier, edges less healthy)
-    # Approximate center of the flight area (adjust if needed)
-    center_lat = 50.329
-    center_lon = 11.939
-    
-    # Distance from the center
-    lat_diff = abs(latitude - center_lat)
-    lon_diff = abs(longitude - center_lon)
-    distance = math.sqrt(lat_diff**2 + lon_diff**2) * 111000  # approx in meters
+    rng = random.Random(int(abs(latitude * 10000) + abs(longitude * 10000)))
+    return generate_health_indices([latitude], [longitude], [relative_altitude], rng)[0]
+
+
+def gauss_batch(rng, n, sigma):
+    """
+    Draws n gaussian samples (mean 0, standard deviation sigma) in one batch.
+    Uses the Box-Muller transform, producing two samples per pair of uniforms
+    from rng (random.gauss does the same one sample per Python call).
+    """
+    uniform = rng.random
+    sqrt, log, cos, sin, tau = math.sqrt, math.log, math.cos, math.sin, math.tau
     
-    # Base health: decreases with distance from the center
-    base_health = 85.0 - (distance / 50.0)  # Max ~85% at center, decreases outward
+    samples = []
+    append = samples.append
+    for _ in range((n + 1) // 2):
+        radius = sigma * sqrt(-2.0 * log(1.0 - uniform()))
+        theta = tau * uniform()
+        append(radius * cos(theta))
+        append(radius * sin(theta))
+    del samples[n:]
+    return samples
+
+
+def generate_health_indices(latitudes, longitudes, relative_altitudes, rng=None):
+    """
+    Column-wise version of generate_health_index.
+    Takes parallel sequences of latitudes, longitudes and relative altitudes
+    and returns the list of health indices.
     
-    # Controlled random variation
-    variation = random.gauss(0, 8)  # gaussian variation
+    The gaussian variation is drawn in one batch from `rng` (a random.Random
+    seeded with HEALTH_SEED by default), so results are reproducible for the
+    same input file but depend on row order rather than on position only.
+    """
+    if rng is None:
+        rng = random.Random(HEALTH_SEED)
     
-    # Effect of altitude (higher altitude = better lighting = potentially healthier)
-    altitude_bonus = 0
-    if relative_altitude:
-        altitude_bonus = min(5.0, (relative_altitude - 1.5) * 2.0)
+    # Controlled random variation (gaussian), drawn in a single batch
+    variations = gauss_batch(rng, len(latitudes), 8.0)
     
-    # Final calculation
-    health = base_health + variation + altitude_bonus
+    # Loop invariants of the great-circle (haversine) distance
+    center_lat = math.radians(CENTER_LAT)
+    center_lon = math.radians(CENTER_LON)
+    cos_center_lat = math.cos(center_lat)
+    diameter = 2 * EARTH_RADIUS
+    sin, cos, asin, sqrt, radians = math.sin, math.cos, math.asin, math.sqrt, math.radians
+    meters_per_health = 50.0
     
-    # Clamp to 0–100
-    health = max(0.0, min(100.0, health))
+    # Single fused pass over the rows (no intermediate lists per step)
+    health_values = []
+    append = health_values.append
+    for lat, lon, alt, variation in zip(latitudes, longitudes, relative_altitudes, variations):
+        # Distance from the center in meters
+        lat_r = radians(lat)
+        sin_dlat = sin((lat_r - center_lat) * 0.5)
+        sin_dlon = sin((radians(lon) - center_lon) * 0.5)
+        a = sin_dlat * sin_dlat + cos(lat_r) * cos_center_lat * sin_dlon * sin_dlon
+        distance = diameter * asin(sqrt(a))
+        
+        # Base health: decreases with distance from the center (max ~85% at center)
+        health = 85.0 - distance / meters_per_health + variation
+        
+        # Effect of altitude (higher altitude = better lighting = potentially healthier)
+        if alt:
+            health += min(5.0, (alt - 1.5) * 2.0)
+        
+        # Clamp to 0–100 (rounded to 2 decimals when written)
+        append(max(0.0, min(100.0, health)))
     
-    return round(health, 2)
+    return health_values
 
 
-def add_health_index_to_csv(input_csv, output_csv):
-    """Adds a health_index column to the CSV."""
-    rows = []
+def iter_csv_lines(path):
+    """Yields the lines of a file as bytes (without line endings) from a read-only memory map."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b''):
+                yield line.rstrip(b'\r\n')
+
+
+def split_csv_line(line):
+    """Splits a CSV line (bytes) into fields (plain split unless the line has quoted fields)."""
+    if b'"' in line:
+        return next(csv.reader([line.decode('utf-8')]))
+    return line.split(b',')
+
+
+def iter_row_chunks(input_lines, n_cols, lat_i, lon_i, alt_i):
+    """
+    Groups CSV lines into chunks of up to CHUNK_SIZE rows.
+    Yields (lines, lats, lons, rel_alts); rows with invalid coordinates or
+    more fields than the header are skipped.
+    """
+    # Current chunk (lines + their numeric columns)
+    lines = []
+    lats = []
+    lons = []
+    rel_alts = []
     
-    print(f"📖 Reading: {input_csv}")
-    with open(input_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
+    for line in input_lines:
+        if not line:
+            continue
         
-        if not fieldnames:
-            print("❌ Error: Empty or invalid CSV")
-            return
+        fields = split_csv_line(line)
+        if len(fields) < n_cols:
+            # Pad missing trailing columns so health_index stays aligned
+            line += b',' * (n_cols - len(fields))
+            fields.extend([''] * (n_cols - len(fields)))
+        elif len(fields) > n_cols:
+            # Extra fields would push health_index under the wrong column
+            print(f"⚠️  Error processing row: expected {n_cols} fields, got {len(fields)}")
+            continue
         
-        # Add health_index to fieldnames
-        new_fieldnames = list(fieldnames) + ['health_index']
+        # Only the conversions can fail: skip the row early in that case
+        try:
+            lat = float(fields[lat_i] or 0) if lat_i is not None else 0.0
+            lon = float(fields[lon_i] or 0) if lon_i is not None else 0.0
+        except ValueError as e:
+            print(f"⚠️  Error processing row: {e}")
+            continue
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            print(f"⚠️  Error processing row: invalid coordinates ({lat}, {lon})")
+            continue
         
-        for row in reader:
+        rel_alt = None
+        if alt_i is not None and fields[alt_i]:
             try:
-                lat = float(row.get('latitude', 0) or 0)
-                lon = float(row.get('longitude', 0) or 0)
-                rel_alt = None
-                if row.get('relative_altitude'):
-                    try:
-                        rel_alt = float(row.get('relative_altitude'))
-                    except (ValueError, TypeError):
-                        pass
-                
-                frame_idx = row.get('frame_index', '0')
-                video = row.get('video_name', 'unknown')
-                
-                # Generate health index
-                health = generate_health_index(lat, lon, rel_alt, frame_idx, video)
-                row['health_index'] = str(health)
-                
-                rows.append(row)
-                
-            except Exception as e:
-                print(f"⚠️  Error processing row: {e}")
-                continue
+                rel_alt = float(fields[alt_i])
+            except ValueError:
+                pass
+        
+        lats.append(lat)
+        lons.append(lon)
+        rel_alts.append(rel_alt)
+        lines.append(line)
+        
+        if len(lines) == CHUNK_SIZE:
+            yield lines, lats, lons, rel_alts
+            lines, lats, lons, rel_alts = [], [], [], []
+    
+    if lines:
+        yield lines, lats, lons, rel_alts
+
+
+def compute_health_chunk(chunk_index, lats, lons, rel_alts):
+    """
+    Computes the health index of one chunk (runs in a worker process).
+    Each chunk has its own generator seeded from HEALTH_SEED and its index,
+    so results do not depend on the number of workers.
+    """
+    rng = random.Random(f"{HEALTH_SEED}:{chunk_index}")
+    return generate_health_indices(lats, lons, rel_alts, rng)
+
+
+def compute_health_chunks(chunks):
+    """
+    Computes the health index of each chunk in a pool of worker processes.
+    Yields (lines, health_values) in input order, keeping at most
+    MAX_PENDING_CHUNKS chunks in flight to bound memory. With a single
+    chunk or CPU the chunks are computed inline, without a pool.
+    """
+    chunks = iter(chunks)
+    first = list(islice(chunks, 2))
+    chunks = chain(first, chunks)
+    
+    if len(first) < 2 or (os.cpu_count() or 1) <= 1:
+        for chunk_index, (lines, lats, lons, rel_alts) in enumerate(chunks):
+            yield lines, compute_health_chunk(chunk_index, lats, lons, rel_alts)
+        return
+    
+    pending = deque()
+    with ProcessPoolExecutor() as executor:
+        for chunk_index, (lines, lats, lons, rel_alts) in enumerate(chunks):
+            future = executor.submit(compute_health_chunk, chunk_index, lats, lons, rel_alts)
+            pending.append((lines, future))
+            
+            if len(pending) >= MAX_PENDING_CHUNKS:
+                lines, future = pending.popleft()
+                yield lines, future.result()
+        
+        while pending:
+            lines, future = pending.popleft()
+            yield lines, future.result()
+
+
+def write_health_chunk(f_out, lines, health_values):
+    """Writes each original line of a chunk with its health value appended."""
+    f_out.writelines([b"%s,%.2f\r\n" % (line, health) for line, health in zip(lines, health_values)])
+
+
+def add_health_index_to_csv(input_csv, output_csv):
+    """
+    Adds a health_index column to the CSV.
+    Rows are streamed from input to output in chunks of CHUNK_SIZE,
+    so memory use does not grow with the size of the file, and the
+    health index of the chunks is computed in parallel worker processes.
+    The input is memory-mapped and only the numeric columns are parsed;
+    the original lines are copied as-is.
+    """
+    print(f"📖 Reading: {input_csv}")
+    input_lines = iter_csv_lines(input_csv)
+    header = next(input_lines, b'')
+    fieldnames = next(csv.reader([header.decode('utf-8')])) if header else None
+    
+    if not fieldnames:
+        print("❌ Error: Empty or invalid CSV")
+        return
+    
+    # Column positions (resolved once from the header)
+    columns = {name: i for i, name in enumerate(fieldnames)}
+    chunks = iter_row_chunks(input_lines, len(fieldnames), columns.get('latitude'),
+                             columns.get('longitude'), columns.get('relative_altitude'))
+    
+    # Running statistics
+    count = 0
+    min_health = math.inf
+    max_health = -math.inf
+    sum_health = 0.0
     
     print(f"💾 Writing: {output_csv}")
-    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=new_fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    with open(output_csv, 'wb') as f_out:
+        # Add health_index to the header
+        f_out.write(header + b",health_index\r\n")
+        
+        for lines, health_values in compute_health_chunks(chunks):
+            write_health_chunk(f_out, lines, health_values)
+            count += len(health_values)
+            min_health = min(min_health, min(health_values))
+            max_health = max(max_health, max(health_values))
+            sum_health += sum(health_values)
     
     # Statistics
-    health_values = [float(row['health_index']) for row in rows if row.get('health_index')]
-    if health_values:
+    if count:
         print(f"\n✅ Health index added!")
-        print(f"   Total records: {len(rows):,}")
-        print(f"   Minimum health: {min(health_values):.2f}%")
-        print(f"   Maximum health: {max(health_values):.2f}%")
-        print(f"   Average health: {mean(health_values):.2f}%")
+        print(f"   Total records: {count:,}")
+        print(f"   Minimum health: {min_health:.2f}%")
+        print(f"   Maximum health: {max_health:.2f}%")
+        print(f"   Average health: {sum_health / count:.2f}%")
         print(f"   File saved: {output_csv}")
 
 
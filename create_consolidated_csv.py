@@ -6,17 +6,50 @@ Uses only Python standard libraries (no external dependencies).
 """
 
 import csv
+import heapq
+import math
 from pathlib import Path
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from operator import itemgetter
 
-def read_csv_file(csv_path):
-    """Reads a CSV file and returns a list of dictionaries."""
+# Define column order (video_name first)
+FIELDNAMES = ['video_name', 'frame_index', 'timestamp', 'latitude', 'longitude',
+              'relative_altitude', 'absolute_altitude', 'iso', 'shutter', 
+              'aperture', 'ev', 'color_mode', 'focal_length', 'color_temperature']
+
+# Positions of the columns used for sorting and statistics
+VIDEO_COL = FIELDNAMES.index('video_name')
+FRAME_COL = FIELDNAMES.index('frame_index')
+TIMESTAMP_COL = FIELDNAMES.index('timestamp')
+LAT_COL = FIELDNAMES.index('latitude')
+LON_COL = FIELDNAMES.index('longitude')
+ALT_COL = FIELDNAMES.index('relative_altitude')
+
+def read_csv_file(csv_path, fieldnames=FIELDNAMES):
+    """
+    Reads a CSV file and returns a list of rows (lists) ordered like fieldnames.
+    Columns missing from the file are left empty.
+    """
     rows = []
     with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        n_cols = len(header)
+        columns = {name: i for i, name in enumerate(header)}
+        
+        # Project every row with a single itemgetter call; missing columns
+        # point to an empty slot appended after the last column
+        project = itemgetter(*(columns.get(col, n_cols) for col in fieldnames))
+        
         for row in reader:
-            rows.append(row)
+            if not row:
+                continue  # blank line (DictReader skipped these too)
+            if len(row) != n_cols:
+                row = (row + [''] * n_cols)[:n_cols]
+            row.append('')
+            rows.append(list(project(row)))
     return rows
 
 def safe_float(value):
@@ -26,6 +59,91 @@ def safe_float(value):
     except (ValueError, TypeError):
         return None
 
+def new_video_stats():
+    """Returns empty running statistics (count, min/max/sum per field)."""
+    return {'count': 0,
+            'lat_n': 0, 'lat_min': math.inf, 'lat_max': -math.inf,
+            'lon_n': 0, 'lon_min': math.inf, 'lon_max': -math.inf,
+            'alt_n': 0, 'alt_min': math.inf, 'alt_max': -math.inf, 'alt_sum': 0.0,
+            'ts_min': None, 'ts_max': None}
+
+def update_video_stats(stats, row):
+    """Updates running statistics with a single row."""
+    stats['count'] += 1
+    lat = safe_float(row[LAT_COL])
+    lon = safe_float(row[LON_COL])
+    alt = safe_float(row[ALT_COL])
+    timestamp = row[TIMESTAMP_COL]
+    
+    if lat:
+        stats['lat_n'] += 1
+        stats['lat_min'] = min(stats['lat_min'], lat)
+        stats['lat_max'] = max(stats['lat_max'], lat)
+    if lon:
+        stats['lon_n'] += 1
+        stats['lon_min'] = min(stats['lon_min'], lon)
+        stats['lon_max'] = max(stats['lon_max'], lon)
+    if alt:
+        stats['alt_n'] += 1
+        stats['alt_min'] = min(stats['alt_min'], alt)
+        stats['alt_max'] = max(stats['alt_max'], alt)
+        stats['alt_sum'] += alt
+    if timestamp:
+        if stats['ts_min'] is None or timestamp < stats['ts_min']:
+            stats['ts_min'] = timestamp
+        if stats['ts_max'] is None or timestamp > stats['ts_max']:
+            stats['ts_max'] = timestamp
+
+def merge_video_stats(total, stats):
+    """Merges running statistics into `total` (in place)."""
+    for key in ('count', 'lat_n', 'lon_n', 'alt_n', 'alt_sum'):
+        total[key] += stats[key]
+    for key in ('lat_min', 'lon_min', 'alt_min'):
+        total[key] = min(total[key], stats[key])
+    for key in ('lat_max', 'lon_max', 'alt_max'):
+        total[key] = max(total[key], stats[key])
+    if stats['ts_min'] is not None:
+        if total['ts_min'] is None or stats['ts_min'] < total['ts_min']:
+            total['ts_min'] = stats['ts_min']
+        if total['ts_max'] is None or stats['ts_max'] > total['ts_max']:
+            total['ts_max'] = stats['ts_max']
+
+def process_file(csv_path):
+    """
+    Loads one per-video metadata CSV (runs in a worker process).
+    Returns (rows, frame_indices, stats, error) with rows sorted by frame_index;
+    error is None on success.
+    """
+    # Extract video name from parent folder
+    video_name = csv_path.parent.name
+    frame_indices = []
+    stats = new_video_stats()
+    
+    try:
+        # Load CSV
+        rows = read_csv_file(csv_path)
+        
+        # Add video_name column and collect statistics
+        for row in rows:
+            row[VIDEO_COL] = video_name
+            
+            try:
+                frame_idx = int(row[FRAME_COL] or 0)
+            except ValueError:
+                frame_idx = 0
+            frame_indices.append(frame_idx)
+            
+            update_video_stats(stats, row)
+    except Exception as e:
+        return [], [], stats, str(e)
+    
+    # Sort this file by frame_index (stable) so the driver only has to merge
+    order = sorted(range(len(rows)), key=frame_indices.__getitem__)
+    rows = [rows[i] for i in order]
+    frame_indices = [frame_indices[i] for i in order]
+    
+    return rows, frame_indices, stats, None
+
 def create_consolidated_csv():
     """
     Creates a single CSV file containing all metadata from all videos.
@@ -42,74 +160,53 @@ def create_consolidated_csv():
     
     print(f"📁 Found {len(csv_files)} CSV file(s)\n")
     
-    all_rows = []
-    video_stats = defaultdict(lambda: {'count': 0, 'latitudes': [], 'longitudes': [], 
-                                       'altitudes': [], 'timestamps': []})
+    runs = defaultdict(list)  # video_name -> [(frame_indices, rows), ...] sorted runs
+    video_stats = defaultdict(new_video_stats)
     
-    for csv_file in sorted(csv_files):
-        # Extract video name from parent folder
-        video_name = csv_file.parent.name
-        print(f"🔄 Processing: {video_name}")
+    # Files are independent: parse them in parallel, merge in order
+    csv_files = sorted(csv_files)
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(process_file, csv_files)
         
-        try:
-            # Load CSV
-            rows = read_csv_file(csv_file)
+        for csv_file, (rows, frame_indices, stats, error) in zip(csv_files, results):
+            video_name = csv_file.parent.name
+            print(f"🔄 Processing: {video_name}")
             
-            # Add video_name column and collect statistics
-            for row in rows:
-                row['video_name'] = video_name
-                all_rows.append(row)
-                
-                # Collect statistics
-                video_stats[video_name]['count'] += 1
-                lat = safe_float(row.get('latitude'))
-                lon = safe_float(row.get('longitude'))
-                alt = safe_float(row.get('relative_altitude'))
-                
-                if lat:
-                    video_stats[video_name]['latitudes'].append(lat)
-                if lon:
-                    video_stats[video_name]['longitudes'].append(lon)
-                if alt:
-                    video_stats[video_name]['altitudes'].append(alt)
-                if row.get('timestamp'):
-                    video_stats[video_name]['timestamps'].append(row['timestamp'])
+            if error is not None:
+                print(f"   ❌ Error processing {csv_file}: {error}")
+                continue
             
-            print(f"   ✅ {len(rows)} frames added")
+            # Header-only files add no run and no stats entry (the video
+            # is only counted once it has frames)
+            if rows:
+                runs[video_name].append((frame_indices, rows))
+                merge_video_stats(video_stats[video_name], stats)
             
-        except Exception as e:
-            print(f"   ❌ Error processing {csv_file}: {str(e)}")
+            print(f"   ✅ {len(rows)} frames added")
+    
+    # Sort by video and frame_index: files come back already sorted,
+    # so only runs of the same video need a (stable) merge
+    all_rows = []
+    for video_name in sorted(runs):
+        video_runs = runs[video_name]
+        if len(video_runs) == 1:
+            all_rows.extend(video_runs[0][1])
+        else:
+            merged = heapq.merge(*(zip(frames, rows) for frames, rows in video_runs),
+                                 key=itemgetter(0))
+            all_rows.extend(row for _, row in merged)
+    del runs
     
     if not all_rows:
         print("\n⚠️  No data was loaded!")
         return
     
-    # Define column order (video_name first)
-    fieldnames = ['video_name', 'frame_index', 'timestamp', 'latitude', 'longitude',
-                  'relative_altitude', 'absolute_altitude', 'iso', 'shutter', 
-                  'aperture', 'ev', 'color_mode', 'focal_length', 'color_temperature']
-    
-    # Sort by video and frame_index
-    def sort_key(row):
-        video = row.get('video_name', '')
-        try:
-            frame_idx = int(row.get('frame_index', 0))
-        except (ValueError, TypeError):
-            frame_idx = 0
-        return (video, frame_idx)
-    
-    all_rows.sort(key=sort_key)
-    
     # Save consolidated file
     output_file = base_dir / 'all_metadata_consolidated.csv'
     with open(output_file, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for row in all_rows:
-            # Ensure all columns exist
-            output_row = {col: row.get(col, '') for col in fieldnames}
-            writer.writerow(output_row)
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(all_rows)
     
     print(f"\n✅ Consolidated file created: {output_file}")
     print(f"   Total frames: {len(all_rows):,}")
@@ -120,67 +217,66 @@ def create_consolidated_csv():
     print("-" * 80)
     
     # Gather global statistics
-    all_lats = []
-    all_lons = []
-    all_alts = []
+    global_stats = new_video_stats()
     
-    # Create statistics file
-    stats_file = base_dir / 'statistics_summary.txt'
-    with open(stats_file, 'w', encoding='utf-8') as f:
-        f.write("Consolidated Statistics of Extracted Metadata\n")
-        f.write("=" * 80 + "\n\n")
-        f.write(f"Total frames: {len(all_rows):,}\n")
-        f.write(f"Total videos: {len(video_stats)}\n\n")
-        f.write("Frames per video:\n")
-        f.write("-" * 80 + "\n")
-        
-        for video in sorted(video_stats.keys()):
-            stats = video_stats[video]
-            count = stats['count']
-            f.write(f"{video}: {count:,} frames\n")
-            print(f"{video}: {count:,} frames")
-            
-            # Collect global data
-            all_lats.extend(stats['latitudes'])
-            all_lons.extend(stats['longitudes'])
-            all_alts.extend(stats['altitudes'])
-        
-        f.write("\n" + "=" * 80 + "\n")
-        f.write("\nDetailed Statistics per Video:\n")
-        f.write("-" * 80 + "\n")
-        
-        for video in sorted(video_stats.keys()):
-            stats = video_stats[video]
-            f.write(f"\n{video}:\n")
-            f.write(f"  Frames: {stats['count']}\n")
-            
-            if stats['latitudes']:
-                f.write(f"  Latitude: {min(stats['latitudes']):.6f} to {max(stats['latitudes']):.6f}\n")
-            if stats['longitudes']:
-                f.write(f"  Longitude: {min(stats['longitudes']):.6f} to {max(stats['longitudes']):.6f}\n")
-            if stats['altitudes']:
-                avg_alt = sum(stats['altitudes']) / len(stats['altitudes'])
-                f.write(f"  Relative Altitude: {min(stats['altitudes']):.2f} to {max(stats['altitudes']):.2f} m (avg: {avg_alt:.2f} m)\n")
-            if stats['timestamps']:
-                f.write(f"  First timestamp: {min(stats['timestamps'])}\n")
-                f.write(f"  Last timestamp: {max(stats['timestamps'])}\n")
+    # Build the statistics report in memory and write it in one go
+    parts = []
+    parts.append("Consolidated Statistics of Extracted Metadata\n")
+    parts.append("=" * 80 + "\n\n")
+    parts.append(f"Total frames: {len(all_rows):,}\n")
+    parts.append(f"Total videos: {len(video_stats)}\n\n")
+    parts.append("Frames per video:\n")
+    parts.append("-" * 80 + "\n")
+    
+    for video in sorted(video_stats.keys()):
+        stats = video_stats[video]
+        count = stats['count']
+        parts.append(f"{video}: {count:,} frames\n")
+        print(f"{video}: {count:,} frames")
         
-        f.write("\n" + "=" * 80 + "\n")
-        f.write("\nGlobal Statistics:\n")
-        f.write("-" * 80 + "\n")
+        # Collect global data
+        merge_video_stats(global_stats, stats)
+    
+    parts.append("\n" + "=" * 80 + "\n")
+    parts.append("\nDetailed Statistics per Video:\n")
+    parts.append("-" * 80 + "\n")
+    
+    for video in sorted(video_stats.keys()):
+        stats = video_stats[video]
+        parts.append(f"\n{video}:\n")
+        parts.append(f"  Frames: {stats['count']}\n")
         
-        if all_lats:
-            f.write(f"Minimum latitude: {min(all_lats):.6f}\n")
-            f.write(f"Maximum latitude: {max(all_lats):.6f}\n")
-        if all_lons:
-            f.write(f"Minimum longitude: {min(all_lons):.6f}\n")
-            f.write(f"Maximum longitude: {max(all_lons):.6f}\n")
-        if all_alts:
-            avg_alt_global = sum(all_alts) / len(all_alts)
-            f.write(f"\nRelative Altitude:\n")
-            f.write(f"  Minimum: {min(all_alts):.2f} m\n")
-            f.write(f"  Maximum: {max(all_alts):.2f} m\n")
-            f.write(f"  Average: {avg_alt_global:.2f} m\n")
+        if stats['lat_n']:
+            parts.append(f"  Latitude: {stats['lat_min']:.6f} to {stats['lat_max']:.6f}\n")
+        if stats['lon_n']:
+            parts.append(f"  Longitude: {stats['lon_min']:.6f} to {stats['lon_max']:.6f}\n")
+        if stats['alt_n']:
+            avg_alt = stats['alt_sum'] / stats['alt_n']
+            parts.append(f"  Relative Altitude: {stats['alt_min']:.2f} to {stats['alt_max']:.2f} m (avg: {avg_alt:.2f} m)\n")
+        if stats['ts_min'] is not None:
+            parts.append(f"  First timestamp: {stats['ts_min']}\n")
+            parts.append(f"  Last timestamp: {stats['ts_max']}\n")
+    
+    parts.append("\n" + "=" * 80 + "\n")
+    parts.append("\nGlobal Statistics:\n")
+    parts.append("-" * 80 + "\n")
+    
+    if global_stats['lat_n']:
+        parts.append(f"Minimum latitude: {global_stats['lat_min']:.6f}\n")
+        parts.append(f"Maximum latitude: {global_stats['lat_max']:.6f}\n")
+    if global_stats['lon_n']:
+        parts.append(f"Minimum longitude: {global_stats['lon_min']:.6f}\n")
+        parts.append(f"Maximum longitude: {global_stats['lon_max']:.6f}\n")
+    if global_stats['alt_n']:
+        avg_alt_global = global_stats['alt_sum'] / global_stats['alt_n']
+        parts.append(f"\nRelative Altitude:\n")
+        parts.append(f"  Minimum: {global_stats['alt_min']:.2f} m\n")
+        parts.append(f"  Maximum: {global_stats['alt_max']:.2f} m\n")
+        parts.append(f"  Average: {avg_alt_global:.2f} m\n")
+    
+    stats_file = base_dir / 'statistics_summary.txt'
+    with open(stats_file, 'w', encoding='utf-8') as f:
+        f.writelines(parts)
     
     print(f"\n✅ Statistics saved to: {stats_file}")
     print("\n" + "=" * 80)
@@ -5,40 +5,87 @@ Extracts GPS, camera and timestamp information from DJI Mini 4 Pro .SRT files.
 Generates CSV files formatted for QGIS/ArcGIS.
 """
 
+import io
 import re
 import os
 import csv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from operator import itemgetter, le
 from pathlib import Path
 from typing import Dict, List, Optional
 
-def parse_metadata_line(line: str) -> Dict[str, Optional[str]]:
+# Per-field patterns (output field name -> regex). Each field accepts only
+# these values: e.g. negative coordinates or a non-numeric ISO are not
+# matched, and frames without a latitude/longitude are dropped.
+FIELD_PATTERNS = {
+    'iso': re.compile(r'\[iso:\s*(\d+)\]'),
+    'shutter': re.compile(r'\[shutter:\s*([^\]]+)\]'),
+    'aperture': re.compile(r'\[fnum:\s*([\d.]+)\]'),
+    'ev': re.compile(r'\[ev:\s*([-\d]+)\]'),
+    'color_mode': re.compile(r'\[color_md:\s*([^\]]+)\]'),
+    'focal_length': re.compile(r'\[focal_len:\s*([\d.]+)\]'),
+    'latitude': re.compile(r'\[latitude:\s*([\d.]+)\]'),
+    'longitude': re.compile(r'\[longitude:\s*([\d.]+)\]'),
+    'relative_altitude': re.compile(r'\[rel_alt:\s*([\d.]+)'),
+    'absolute_altitude': re.compile(r'abs_alt:\s*([\d.]+)\]'),
+    'color_temperature': re.compile(r'\[ct:\s*(\d+)\]'),
+}
+
+# Fast path: the standard DJI line, matched in a single pass with one named
+# group per output field (same value patterns as FIELD_PATTERNS). Lines in
+# any other layout are matched field by field.
+METADATA_LINE_RE = re.compile(
+    r'\[iso:\s*(?P<iso>\d+)\]\s*'
+    r'\[shutter:\s*(?P<shutter>[^\]]+)\]\s*'
+    r'\[fnum:\s*(?P<aperture>[\d.]+)\]\s*'
+    r'\[ev:\s*(?P<ev>[-\d]+)\]\s*'
+    r'\[color_md:\s*(?P<color_mode>[^\]]+)\]\s*'
+    r'\[focal_len:\s*(?P<focal_length>[\d.]+)\]\s*'
+    r'\[latitude:\s*(?P<latitude>[\d.]+)\]\s*'
+    r'\[longitude:\s*(?P<longitude>[\d.]+)\]\s*'
+    r'\[rel_alt:\s*(?P<relative_altitude>[\d.]+)\s*'
+    r'abs_alt:\s*(?P<absolute_altitude>[\d.]+)\]\s*'
+    r'\[ct:\s*(?P<color_temperature>\d+)\]'
+)
+
+FRAMECNT_RE = re.compile(r'FrameCnt:\s*(\d+)')
+
+# Timestamp format: YYYY-MM-DD HH:MM:SS.mmm
+TIMESTAMP_RE = re.compile(r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})')
+
+# CSV columns in the desired order
+FIELDNAMES = (
+    'frame_index',
+    'timestamp',
+    'latitude',
+    'longitude',
+    'relative_altitude',
+    'absolute_altitude',
+    'iso',
+    'shutter',
+    'aperture',
+    'ev',
+    'color_mode',
+    'focal_length',
+    'color_temperature'
+)
+
+def parse_metadata_line(line: str) -> Dict[str, str]:
     """
     Extracts metadata from a line containing [key: value] pairs.
-    Returns a dictionary with all extracted fields.
+    Returns a dictionary keyed by output field name (see FIELD_PATTERNS);
+    fields that are missing or have an invalid value are left out.
     """
-    metadata = {}
-    
-    # Regex patterns for each field
-    patterns = {
-        'iso': r'\[iso:\s*(\d+)\]',
-        'shutter': r'\[shutter:\s*([^\]]+)\]',
-        'fnum': r'\[fnum:\s*([\d.]+)\]',
-        'ev': r'\[ev:\s*([-\d]+)\]',
-        'color_md': r'\[color_md:\s*([^\]]+)\]',
-        'focal_len': r'\[focal_len:\s*([\d.]+)\]',
-        'latitude': r'\[latitude:\s*([\d.]+)\]',
-        'longitude': r'\[longitude:\s*([\d.]+)\]',
-        'rel_alt': r'\[rel_alt:\s*([\d.]+)',
-        'abs_alt': r'abs_alt:\s*([\d.]+)\]',
-        'ct': r'\[ct:\s*(\d+)\]'
-    }
+    match = METADATA_LINE_RE.search(line)
+    if match:
+        return match.groupdict()
     
-    for key, pattern in patterns.items():
-        match = re.search(pattern, line)
-        if match:
-            metadata[key] = match.group(1)
-        else:
-            metadata[key] = None
+    metadata = {}
+    for field, pattern in FIELD_PATTERNS.items():
+        field_match = pattern.search(line)
+        if field_match:
+            metadata[field] = field_match.group(1)
     
     return metadata
 
@@ -64,16 +111,21 @@ def extract_frame_info(lines: List[str]) -> Optional[Dict[str, str]]:
     }
     
     # Search for FrameCnt
+    # Substring checks (memchr-speed) skip the regex on lines that cannot match
     for line in lines:
-        frame_match = re.search(r'FrameCnt:\s*(\d+)', line)
+        if 'FrameCnt' not in line:
+            continue
+        frame_match = FRAMECNT_RE.search(line)
         if frame_match:
-            frame_data['frame_index'] = frame_match.group(1)
+            # Stored as int so frames sort numerically without a key function
+            frame_data['frame_index'] = int(frame_match.group(1))
             break
     
     # Search for timestamp (format: YYYY-MM-DD HH:MM:SS.mmm)
-    timestamp_pattern = r'(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\.\d{3})'
     for line in lines:
-        ts_match = re.search(timestamp_pattern, line)
+        if '.' not in line:
+            continue
+        ts_match = TIMESTAMP_RE.search(line)
         if ts_match:
             frame_data['timestamp'] = ts_match.group(1)
             break
@@ -89,89 +141,133 @@ def extract_frame_info(lines: List[str]) -> Optional[Dict[str, str]]:
         return None
     
     # Extract metadata
-    metadata = parse_metadata_line(metadata_line)
-    
-    # Map fields
-    frame_data['iso'] = metadata.get('iso')
-    frame_data['shutter'] = metadata.get('shutter')
-    frame_data['aperture'] = metadata.get('fnum')
-    frame_data['ev'] = metadata.get('ev')
-    frame_data['color_mode'] = metadata.get('color_md')
-    frame_data['focal_length'] = metadata.get('focal_len')
-    frame_data['latitude'] = metadata.get('latitude')
-    frame_data['longitude'] = metadata.get('longitude')
-    frame_data['relative_altitude'] = metadata.get('rel_alt')
-    frame_data['absolute_altitude'] = metadata.get('abs_alt')
-    frame_data['color_temperature'] = metadata.get('ct')
+    frame_data.update(parse_metadata_line(metadata_line))
     
     # Validate essential fields
-    if frame_data['frame_index'] and frame_data['latitude'] and frame_data['longitude']:
+    if frame_data['frame_index'] is not None and frame_data['latitude'] and frame_data['longitude']:
         return frame_data
     
     return None
 
-def parse_srt_file(srt_path: Path) -> List[Dict[str, str]]:
+def new_frame_columns() -> Dict[str, List[Optional[str]]]:
     """
-    Parses a full SRT file and returns a list of metadata dictionaries.
+    Creates an empty column store: one list per CSV field.
     """
-    with open(srt_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    return {field: [] for field in FIELDNAMES}
+
+def append_frame(columns: Dict[str, List[Optional[str]]], frame_data: Dict[str, Optional[str]]):
+    """
+    Appends one frame to the column store.
+    """
+    for field, column in columns.items():
+        column.append(frame_data[field])
+
+def parse_srt_file(srt_path: Path) -> Dict[str, List[Optional[str]]]:
+    """
+    Parses a full SRT file and returns the frames as columns
+    (a dictionary mapping each field to the list of its values).
+    """
+    columns = new_frame_columns()
     
-    # Split into frame blocks (each block separated by double blank line)
-    blocks = re.split(r'\n\s*\n', content)
+    # Stream the file: frame blocks are separated by blank lines, so only
+    # the lines of the current block are held in memory
+    lines = []
     
-    all_frames = []
+    with open(srt_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.isspace():
+                lines.append(line.rstrip('\n'))
+                continue
+            
+            if lines:
+                frame_data = extract_frame_info(lines)
+                if frame_data:
+                    append_frame(columns, frame_data)
+                lines.clear()
     
-    for block in blocks:
-        if not block.strip():
-            continue
-        
-        lines = block.strip().split('\n')
+    # Last block (file may not end with a blank line)
+    if lines:
         frame_data = extract_frame_info(lines)
-        
         if frame_data:
-            all_frames.append(frame_data)
+            append_frame(columns, frame_data)
     
-    return all_frames
+    return columns
 
-def write_csv(data: List[Dict[str, str]], output_path: Path):
+def write_csv(columns: Dict[str, List[Optional[str]]], output_path: Path):
     """
     Writes extracted data to a CSV formatted for QGIS/ArcGIS.
     """
-    if not data:
+    frame_indices = columns['frame_index']
+    
+    if not frame_indices:
         print(f"⚠️  No data found to write to {output_path}")
         return
     
-    # Sort by frame_index
-    data_sorted = sorted(data, key=lambda x: int(x.get('frame_index', 0)))
-    
-    # Columns in the desired order
-    fieldnames = [
-        'frame_index',
-        'timestamp',
-        'latitude',
-        'longitude',
-        'relative_altitude',
-        'absolute_altitude',
-        'iso',
-        'shutter',
-        'aperture',
-        'ev',
-        'color_mode',
-        'focal_length',
-        'color_temperature'
-    ]
+    # Rows are built by zipping the columns
+    rows = zip(*(columns[field] for field in FIELDNAMES))
+    
+    # Sort by frame_index; SRT frames are normally already in order,
+    # in which case the columns are streamed straight to the writer
+    if not all(map(le, frame_indices, islice(frame_indices, 1, None))):
+        rows = sorted(rows, key=itemgetter(0))
+    
+    # Format the whole file in memory and write it in one call
+    buffer = io.StringIO(newline='')
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDNAMES)
+    writer.writerows(rows)
     
     with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+        csvfile.write(buffer.getvalue())
+
+def process_srt_file(srt_file: Path, output_base: Path):
+    """
+    Extracts one SRT file to its CSV and summary files (runs in a worker process).
+    Returns (frame_count, csv_path, error); error is None on success.
+    """
+    try:
+        # Extract base name (without extension)
+        base_name = srt_file.stem
+        
+        # Create folder for this file
+        file_output_dir = output_base / base_name
+        file_output_dir.mkdir(exist_ok=True)
+        
+        # Process SRT file
+        frames_data = parse_srt_file(srt_file)
+        frame_count = len(frames_data['frame_index'])
+        
+        if not frame_count:
+            return 0, None, None
+        
+        # Create CSV file
+        csv_path = file_output_dir / f'{base_name}_metadata.csv'
+        write_csv(frames_data, csv_path)
         
-        for frame in data_sorted:
-            # Ensure all fields exist
-            row = {field: frame.get(field, '') for field in fieldnames}
-            writer.writerow(row)
+        # Create summary text file (built in memory, written once)
+        parts = []
+        parts.append(f"File: {srt_file.name}\n")
+        parts.append(f"Total frames extracted: {frame_count}\n")
+        parts.append(f"\nFirst 5 frames:\n")
+        parts.append("-" * 80 + "\n")
+        
+        for i in range(min(5, frame_count)):
+            parts.append(f"\nFrame {i + 1}:\n")
+            parts.append(f"  Frame Index: {frames_data['frame_index'][i]}\n")
+            parts.append(f"  Timestamp: {frames_data['timestamp'][i]}\n")
+            parts.append(f"  Latitude: {frames_data['latitude'][i]}\n")
+            parts.append(f"  Longitude: {frames_data['longitude'][i]}\n")
+            parts.append(f"  Relative Altitude: {frames_data['relative_altitude'][i]} m\n")
+            parts.append(f"  ISO: {frames_data['iso'][i]}\n")
+            parts.append(f"  Focal Length: {frames_data['focal_length'][i]} mm\n")
+        
+        summary_path = file_output_dir / f'{base_name}_summary.txt'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.writelines(parts)
+    except Exception as e:
+        return 0, None, str(e)
     
-    print(f"✅ CSV created: {output_path} ({len(data_sorted)} frames)")
+    return frame_count, csv_path, None
 
 def process_all_srt_files(base_dir: Path):
     """
@@ -180,7 +276,8 @@ def process_all_srt_files(base_dir: Path):
     base_dir = Path(base_dir)
     
     # Find all SRT files
-    srt_files = list(base_dir.rglob('*.SRT')) + list(base_dir.rglob('*.srt'))
+    # (a set: on case-insensitive file systems both patterns match the same files)
+    srt_files = sorted(set(base_dir.rglob('*.SRT')) | set(base_dir.rglob('*.srt')))
     
     if not srt_files:
         print(f"⚠️  No .SRT files found in {base_dir}")
@@ -194,50 +291,21 @@ def process_all_srt_files(base_dir: Path):
     
     processed_count = 0
     
-    for srt_file in sorted(srt_files):
-        print(f"🔄 Processing: {srt_file.name}")
+    # Files are independent: extract them in parallel, report in order
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(process_srt_file, srt_files, repeat(output_base))
         
-        try:
-            # Extract base name (without extension)
-            base_name = srt_file.stem
-            
-            # Create folder for this file
-            file_output_dir = output_base / base_name
-            file_output_dir.mkdir(exist_ok=True)
-            
-            # Process SRT file
-            frames_data = parse_srt_file(srt_file)
+        for srt_file, (frame_count, csv_path, error) in zip(srt_files, results):
+            print(f"🔄 Processing: {srt_file.name}")
             
-            if frames_data:
-                # Create CSV file
-                csv_path = file_output_dir / f'{base_name}_metadata.csv'
-                write_csv(frames_data, csv_path)
-                
-                # Create summary text file
-                summary_path = file_output_dir / f'{base_name}_summary.txt'
-                with open(summary_path, 'w', encoding='utf-8') as f:
-                    f.write(f"File: {srt_file.name}\n")
-                    f.write(f"Total frames extracted: {len(frames_data)}\n")
-                    f.write(f"\nFirst 5 frames:\n")
-                    f.write("-" * 80 + "\n")
-                    
-                    for i, frame in enumerate(frames_data[:5], 1):
-                        f.write(f"\nFrame {i}:\n")
-                        f.write(f"  Frame Index: {frame.get('frame_index')}\n")
-                        f.write(f"  Timestamp: {frame.get('timestamp')}\n")
-                        f.write(f"  Latitude: {frame.get('latitude')}\n")
-                        f.write(f"  Longitude: {frame.get('longitude')}\n")
-                        f.write(f"  Relative Altitude: {frame.get('relative_altitude')} m\n")
-                        f.write(f"  ISO: {frame.get('iso')}\n")
-                        f.write(f"  Focal Length: {frame.get('focal_length')} mm\n")
-                
-                print(f"   ✅ {len(frames_data)} frames extracted\n")
+            if error is not None:
+                print(f"   ❌ Error processing {srt_file.name}: {error}\n")
+            elif frame_count:
+                print(f"✅ CSV created: {csv_path} ({frame_count} frames)")
+                print(f"   ✅ {frame_count} frames extracted\n")
                 processed_count += 1
             else:
                 print(f"   ⚠️  No valid frames found\n")
-                
-        except Exception as e:
-            print(f"   ❌ Error processing {srt_file.name}: {str(e)}\n")
     
     print(f"\n{'='*80}")
     print(f"✅ Processing complete!")
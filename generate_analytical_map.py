@@ -6,118 +6,252 @@ Includes spatial interpolation and multiple visualization layers.
 """
 
 import csv
-import json
-import math
+import os
 from pathlib import Path
-from statistics import mean
+from statistics import fmean
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# IDW interpolation parameters
+IDW_MAX_DISTANCE = 0.001  # ~111 meters
+IDW_EXACT_DISTANCE = 0.00001  # closer than this → use the point value directly
+
+# Interpolated grid health is stored as one byte per cell (0–100 → 0–255)
+HEALTH_SCALE = 2.55
+
+
+def new_point_columns():
+    """
+    Creates an empty point store: float arrays for the numeric columns
+    (lat, lon, health) and lists for the text columns.
+    """
+    return {
+        "lat": array("d"),
+        "lon": array("d"),
+        "health": array("d"),
+        "frame_index": [],
+        "timestamp": [],
+        "video_name": [],
+        "relative_altitude": [],
+    }
 
 
 def load_metadata_with_health(csv_path):
-    """Reads the CSV with health index and returns a list of points."""
-    points = []
+    """
+    Reads the CSV with health index and returns the points as columns:
+    a dictionary of parallel arrays (see new_point_columns).
+    """
+    points = new_point_columns()
+    lats, lons, healths = points["lat"], points["lon"], points["health"]
+    frames, timestamps = points["frame_index"], points["timestamp"]
+    videos, rel_alts = points["video_name"], points["relative_altitude"]
     with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        n_cols = len(header)
+        columns = {name: i for i, name in enumerate(header)}
+        
+        # Positional access; missing columns point to an empty slot
+        # appended after the last column
+        lat_i, lon_i, health_i, frame_i, ts_i, video_i, alt_i = (
+            columns.get(col, n_cols)
+            for col in ("latitude", "longitude", "health_index", "frame_index",
+                        "timestamp", "video_name", "relative_altitude")
+        )
+        
         for row in reader:
+            if len(row) != n_cols:
+                row = (row + [""] * n_cols)[:n_cols]
+            row.append("")
+            
             try:
-                lat = float(row.get("latitude", "") or 0)
-                lon = float(row.get("longitude", "") or 0)
-                health = float(row.get("health_index", "") or 0)
-            except (ValueError, TypeError):
+                lat = float(row[lat_i] or 0)
+                lon = float(row[lon_i] or 0)
+                health = float(row[health_i] or 0)
+            except ValueError:
                 continue
             
             if lat == 0 and lon == 0:
                 continue
                 
-            points.append({
-                "lat": lat,
-                "lon": lon,
-                "health": health,
-                "frame_index": row.get("frame_index", ""),
-                "timestamp": row.get("timestamp", ""),
-                "video_name": row.get("video_name", ""),
-                "relative_altitude": row.get("relative_altitude", ""),
-            })
+            lats.append(lat)
+            lons.append(lon)
+            healths.append(health)
+            frames.append(row[frame_i])
+            timestamps.append(row[ts_i])
+            videos.append(row[video_i])
+            rel_alts.append(row[alt_i])
     
     return points
 
 
 def calculate_bounds(points):
     """Computes the bounding box of the flight area."""
-    lats = [p["lat"] for p in points]
-    lons = [p["lon"] for p in points]
+    lats = points["lat"]
+    lons = points["lon"]
     
     return {
         "min_lat": min(lats),
         "max_lat": max(lats),
         "min_lon": min(lons),
         "max_lon": max(lons),
-        "center_lat": mean(lats),
-        "center_lon": mean(lons),
+        "center_lat": fmean(lats),
+        "center_lon": fmean(lons),
     }
 
 
-def create_interpolation_grid(points, grid_size=100):
+def encode_health(health):
+    """Quantizes a health index (0–100) to one byte (0–255)."""
+    return max(0, min(255, int(health * HEALTH_SCALE + 0.5)))
+
+
+def decode_health(code):
+    """Converts a one-byte health code back to a health index (0–100)."""
+    return round(code / HEALTH_SCALE, 2)
+
+
+def interpolate_grid_rows(row_lats, grid_lons, point_lats, point_lons, point_healths, lat_order):
     """
-    Creates an interpolated grid using inverse distance weighting (IDW).
-    grid_size: number of cells per dimension (total = grid_size^2)
+    IDW-interpolates a band of grid rows (runs in a worker process).
+    Returns (lats, lons, health_codes) for the cells of those rows that have
+    nearby data, with the health quantized to one byte (see HEALTH_SCALE).
+    lat_order lists the point indices sorted by latitude; it is used as a
+    spatial index so only points within IDW_MAX_DISTANCE are looked at.
     """
-    bounds = calculate_bounds(points)
-    
-    lat_step = (bounds["max_lat"] - bounds["min_lat"]) / grid_size
-    lon_step = (bounds["max_lon"] - bounds["min_lon"]) / grid_size
+    cell_lats = []
+    cell_lons = []
+    health_codes = array("B")
     
-    grid_points = []
+    # Distance exponent is 2 (higher = more localized influence), so the
+    # weight is 1 / squared distance and no square root is needed
+    max_distance_sq = IDW_MAX_DISTANCE * IDW_MAX_DISTANCE
+    exact_distance_sq = IDW_EXACT_DISTANCE * IDW_EXACT_DISTANCE
     
-    # IDW interpolation parameters
-    power = 2.0  # distance exponent (higher = more localized influence)
-    max_distance = 0.001  # ~111 meters
+    # Search window, slightly widened so rounding never drops a point
+    window = IDW_MAX_DISTANCE * 1.001
+    sorted_lats = [point_lats[index] for index in lat_order]
     
-    for i in range(grid_size + 1):
-        for j in range(grid_size + 1):
-            grid_lat = bounds["min_lat"] + i * lat_step
-            grid_lon = bounds["min_lon"] + j * lon_step
+    for grid_lat in row_lats:
+        # Points within the latitude window of this row, sorted by longitude
+        lo = bisect_left(sorted_lats, grid_lat - window)
+        hi = bisect_right(sorted_lats, grid_lat + window)
+        if lo == hi:
+            continue  # no data near this row (sparse tracks leave many empty)
+        
+        row_points = sorted(lat_order[lo:hi], key=point_lons.__getitem__)
+        row_lons = [point_lons[index] for index in row_points]
+        
+        for grid_lon in grid_lons:
+            lo = bisect_left(row_lons, grid_lon - window)
+            hi = bisect_right(row_lons, grid_lon + window)
+            if lo == hi:
+                continue  # empty cell
+            
+            # Candidates in original point order, so sums and the
+            # "very close" match are the same as scanning every point
+            candidates = sorted(row_points[lo:hi])
             
             # IDW computation
             weighted_sum = 0.0
             weight_sum = 0.0
             
-            for point in points:
-                # Distance in degrees (approximation)
-                lat_diff = grid_lat - point["lat"]
-                lon_diff = grid_lon - point["lon"]
-                distance = math.sqrt(lat_diff**2 + lon_diff**2)
+            for index in candidates:
+                # Squared distance in degrees (approximation)
+                lat_diff = grid_lat - point_lats[index]
+                lon_diff = grid_lon - point_lons[index]
+                distance_sq = lat_diff * lat_diff + lon_diff * lon_diff
                 
-                if distance < max_distance:
-                    if distance < 0.00001:  # Very close → use direct value
-                        weighted_sum = point["health"]
+                if distance_sq < max_distance_sq:
+                    if distance_sq < exact_distance_sq:  # Very close → use direct value
+                        weighted_sum = point_healths[index]
                         weight_sum = 1.0
                         break
                     
-                    weight = 1.0 / (distance ** power)
-                    weighted_sum += point["health"] * weight
+                    weight = 1.0 / distance_sq
+                    weighted_sum += point_healths[index] * weight
                     weight_sum += weight
             
             if weight_sum > 0:
                 interpolated_health = weighted_sum / weight_sum
-                grid_points.append({
-                    "lat": grid_lat,
-                    "lon": grid_lon,
-                    "health": round(interpolated_health, 2)
-                })
+                cell_lats.append(grid_lat)
+                cell_lons.append(grid_lon)
+                health_codes.append(encode_health(interpolated_health))
     
-    return grid_points
+    return cell_lats, cell_lons, health_codes
 
 
-def health_to_color(health, min_health, max_health):
-    """Converts vegetation health index (0–100) to an RGB color using a green–red gradient."""
-    if max_health == min_health:
-        ratio = 0.5
+# Point columns of the grid worker processes (set once per worker by
+# init_grid_worker, so they are not pickled again for every band)
+_grid_points = None
+
+
+def init_grid_worker(point_lats, point_lons, point_healths, lat_order):
+    """Stores the point columns in a grid worker process."""
+    global _grid_points
+    _grid_points = (point_lats, point_lons, point_healths, lat_order)
+
+
+def interpolate_grid_band(row_lats, grid_lons):
+    """Interpolates a band of grid rows from the worker's point columns."""
+    return interpolate_grid_rows(row_lats, grid_lons, *_grid_points)
+
+
+def create_interpolation_grid(points, grid_size=100):
+    """
+    Creates an interpolated grid using inverse distance weighting (IDW).
+    grid_size: number of cells per dimension (total = grid_size^2)
+    Bands of rows are interpolated in parallel worker processes (serially
+    with a single band or CPU).
+    Returns parallel arrays (lats, lons, health_codes) of the cells with
+    nearby data; health codes are one byte each (see decode_health).
+    """
+    bounds = calculate_bounds(points)
+    
+    lat_step = (bounds["max_lat"] - bounds["min_lat"]) / grid_size
+    lon_step = (bounds["max_lon"] - bounds["min_lon"]) / grid_size
+    
+    grid_lats = [bounds["min_lat"] + i * lat_step for i in range(grid_size + 1)]
+    grid_lons = [bounds["min_lon"] + j * lon_step for j in range(grid_size + 1)]
+    
+    # Plain lists: indexing them in the inner loop is faster than arrays
+    point_lats = list(points["lat"])
+    point_lons = list(points["lon"])
+    point_healths = list(points["health"])
+    lat_order = sorted(range(len(point_lats)), key=point_lats.__getitem__)
+    
+    # A few bands per worker keeps the load balanced
+    cpu_count = os.cpu_count() or 1
+    band_size = max(1, -(-len(grid_lats) // (4 * cpu_count)))
+    bands = [grid_lats[k:k + band_size] for k in range(0, len(grid_lats), band_size)]
+    point_columns = (point_lats, point_lons, point_healths, lat_order)
+    
+    if len(bands) > 1 and cpu_count > 1:
+        # Point columns are sent to each worker once, not with every band
+        with ProcessPoolExecutor(initializer=init_grid_worker, initargs=point_columns) as executor:
+            results = list(executor.map(interpolate_grid_band, bands, repeat(grid_lons)))
     else:
-        ratio = (health - min_health) / (max_health - min_health)
+        results = [interpolate_grid_rows(band, grid_lons, *point_columns) for band in bands]
     
-    ratio = max(0.0, min(1.0, ratio))
+    grid_lats_out = array("d")
+    grid_lons_out = array("d")
+    grid_health = array("B")
+    for cell_lats, cell_lons, health_codes in results:
+        grid_lats_out.extend(cell_lats)
+        grid_lons_out.extend(cell_lons)
+        grid_health.extend(health_codes)
     
+    return grid_lats_out, grid_lons_out, grid_health
+
+
+def gradient_color(ratio):
+    """
+    Converts a ratio (0–1) to an RGB color on the green–red gradient.
+    Every branch stays within 0–255 for ratios in 0–1 (the only inputs,
+    see COLOR_LUT), so the channels need no clamping.
+    """
     # Gradient: Green (healthy 100%) → Yellow → Orange → Red (poor 0%)
     if ratio > 0.66:  # Green to yellow
         r = int(255 * (1 - (ratio - 0.66) / 0.34))
@@ -132,47 +266,55 @@ def health_to_color(health, min_health, max_health):
         g = int(255 * (ratio / 0.33))
         b = 0
     
-    r = max(0, min(255, r))
-    g = max(0, min(255, g))
-    b = max(0, min(255, b))
-    
     return f"#{r:02x}{g:02x}{b:02x}"
 
 
+# Gradient precomputed at 256 levels (finer than the eye can tell apart)
+COLOR_LUT_MAX = 255
+COLOR_LUT = [gradient_color(i / COLOR_LUT_MAX) for i in range(COLOR_LUT_MAX + 1)]
+
+
+def health_to_color(health, min_health, max_health):
+    """Converts vegetation health index (0–100) to an RGB color using a green–red gradient."""
+    if max_health == min_health:
+        ratio = 0.5
+    else:
+        ratio = (health - min_health) / (max_health - min_health)
+    ratio = max(0.0, min(1.0, ratio))
+    
+    return COLOR_LUT[int(ratio * COLOR_LUT_MAX + 0.5)]
+
+
 def calculate_statistics(points):
     """Computes descriptive statistics for vegetation health."""
-    health_values = [p["health"] for p in points]
-    
-    if not health_values:
+    if not points["health"]:
         return {}
     
-    health_values.sort()
+    # One sort gives min/max and the quartiles by index
+    health_values = sorted(points["health"])
     n = len(health_values)
     
     return {
         "count": n,
-        "min": min(health_values),
-        "max": max(health_values),
-        "mean": mean(health_values),
+        "min": health_values[0],
+        "max": health_values[-1],
+        "mean": fmean(health_values),
         "median": health_values[n // 2] if n > 0 else 0,
         "q25": health_values[n // 4] if n >= 4 else health_values[0],
         "q75": health_values[3 * n // 4] if n >= 4 else health_values[-1],
     }
 
 
-def build_analytical_map_html(points, grid_points, bounds, stats, output_path):
+def build_analytical_map_html(points, grid, bounds, stats, output_path):
     """Generates the HTML for the analytical map."""
     center_lat = bounds["center_lat"]
     center_lon = bounds["center_lon"]
     
     # Extract min/max health
-    health_values = [p["health"] for p in points]
+    health_values = points["health"]
     min_health = min(health_values) if health_values else 0
     max_health = max(health_values) if health_values else 100
     
-    # Prepare heatmap data
-    heatmap_data = [[p["lat"], p["lon"], p["health"]] for p in points]
-    
     # (HTML content remains in Portuguese as originally written)
     
     html = f"""<!DOCTYPE html>
@@ -203,11 +345,11 @@ def main():
     print("📖 Carregando dados...")
     points = load_metadata_with_health(csv_path)
     
-    if not points:
+    if not points["lat"]:
         print("❌ Nenhum ponto encontrado!")
         return
     
-    print(f"   ✅ {len(points):,} pontos carregados")
+    print(f"   ✅ {len(points['lat']):,} pontos carregados")
     
     # Compute bounds
     print("\n🗺️  Calculando área de voo...")
@@ -223,8 +365,8 @@ def main():
     
     # Create interpolation grid
     print("\n🔢 Criando grid interpolado (isso pode levar alguns segundos)...")
-    grid_points = create_interpolation_grid(points, grid_size=80)
-    print(f"   ✅ Grid criado com {len(grid_points):,} células")
+    grid = create_interpolation_grid(points, grid_size=80)
+    print(f"   ✅ Grid criado com {len(grid[0]):,} células")
     
     # Generate HTML map
     print("\n🎨 Gerando mapa HTML...")
@@ -232,7 +374,7 @@ def main():
     output_dir.mkdir(exist_ok=True)
     output_file = output_dir / "analytical_map.html"
     
-    build_analytical_map_html(points, grid_points, bounds, stats, output_file)
+    build_analytical_map_html(points, grid, bounds, stats, output_file)
     
     print(f"\n{'='*80}")
     print("✅ Processamento concluído!")
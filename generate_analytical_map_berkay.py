@@ -10,9 +10,12 @@ Generates an interactive analytical map with:
 """
 
 import csv
+from array import array
 from pathlib import Path
-from statistics import mean
+from statistics import fmean
 from collections import defaultdict
+from itertools import repeat
+from operator import mod
 
 # ---------------------------
 # Helpers
@@ -34,60 +37,85 @@ def safe_int(value, default=None):
     except (ValueError, TypeError):
         return default
 
+def new_point_columns():
+    """
+    Empty point store: float arrays for lat/lon/health, lists for the rest.
+    """
+    return {
+        "lat": array("d"),
+        "lon": array("d"),
+        "health": array("d"),
+        "video_name": [],
+        "frame_index": [],
+        "frame_index_raw": [],
+        "timestamp": [],
+    }
+
 def load_metadata_with_health(csv_path: Path):
-    """Reads the CSV with health index and returns a list of points."""
-    points = []
+    """
+    Reads the CSV with health index and returns the points as columns
+    (a dictionary of parallel arrays, see new_point_columns).
+    """
+    points = new_point_columns()
     with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        n_cols = len(header)
+        columns = {name: i for i, name in enumerate(header)}
+
+        # Positional access; missing columns point to an empty slot
+        # appended after the last column
+        lat_i, lon_i, health_i, video_i, flight_i, frame_i, frame_cnt_i, ts_i = (
+            columns.get(col, n_cols)
+            for col in ("latitude", "longitude", "health_index", "video_name",
+                        "flight_id", "frame_index", "FrameCnt", "timestamp")
+        )
+
         for row in reader:
-            lat = safe_float(row.get("latitude"), None)
-            lon = safe_float(row.get("longitude"), None)
-            health = safe_float(row.get("health_index"), None)
+            if len(row) != n_cols:
+                row = (row + [""] * n_cols)[:n_cols]
+            row.append("")
+
+            lat = safe_float(row[lat_i], None)
+            lon = safe_float(row[lon_i], None)
+            health = safe_float(row[health_i], None)
 
             if lat is None or lon is None or health is None:
                 continue
 
             # Grouping key (track / flight)
-            video_name = row.get("video_name") or row.get("flight_id") or "unknown"
+            video_name = row[video_i] or row[flight_i] or "unknown"
 
             # Try to order points inside each track
-            frame_index_raw = row.get("frame_index") or row.get("FrameCnt") or ""
+            frame_index_raw = row[frame_i] or row[frame_cnt_i] or ""
             frame_index = safe_int(frame_index_raw, default=None)
 
-            points.append({
-                "lat": lat,
-                "lon": lon,
-                "health": health,
-                "video_name": video_name,
-                "frame_index": frame_index,
-                "frame_index_raw": frame_index_raw,
-                "timestamp": row.get("timestamp", "")
-            })
+            points["lat"].append(lat)
+            points["lon"].append(lon)
+            points["health"].append(health)
+            points["video_name"].append(video_name)
+            points["frame_index"].append(frame_index)
+            points["frame_index_raw"].append(frame_index_raw)
+            points["timestamp"].append(row[ts_i])
     return points
 
 def calculate_bounds(points):
-    lats = [p["lat"] for p in points]
-    lons = [p["lon"] for p in points]
+    lats = points["lat"]
+    lons = points["lon"]
     return {
         "min_lat": min(lats),
         "max_lat": max(lats),
         "min_lon": min(lons),
         "max_lon": max(lons),
-        "center_lat": mean(lats),
-        "center_lon": mean(lons),
+        "center_lat": fmean(lats),
+        "center_lon": fmean(lons),
     }
 
-def health_to_color(health, min_health, max_health):
+def gradient_color(ratio):
     """
-    Red → Yellow → Green gradient based on normalized health.
+    Red → Yellow → Green gradient for a normalized ratio.
     0   → 0.5 →  1
     """
-    if max_health == min_health:
-        ratio = 0.5
-    else:
-        ratio = (health - min_health) / (max_health - min_health)
-    ratio = max(0.0, min(1.0, ratio))
-
     if ratio <= 0.5:
         # Red -> Yellow
         r = 255
@@ -100,72 +128,91 @@ def health_to_color(health, min_health, max_health):
         b = 0
     return f"#{r:02x}{g:02x}{b:02x}"
 
+# Gradient precomputed at 256 levels (finer than the eye can tell apart)
+COLOR_LUT_MAX = 255
+COLOR_LUT = [gradient_color(i / COLOR_LUT_MAX) for i in range(COLOR_LUT_MAX + 1)]
+
+def health_to_color(health, min_health, max_health):
+    """
+    Red → Yellow → Green gradient based on normalized health.
+    0   → 0.5 →  1
+    """
+    if max_health == min_health:
+        ratio = 0.5
+    else:
+        ratio = (health - min_health) / (max_health - min_health)
+    ratio = max(0.0, min(1.0, ratio))
+
+    return COLOR_LUT[int(ratio * COLOR_LUT_MAX + 0.5)]
+
 # ---------------------------
 # HTML builder
 # ---------------------------
 
-def build_map_html(points, bounds, output_path: Path):
-    center_lat = bounds["center_lat"]
-    center_lon = bounds["center_lon"]
+# Characters not allowed in JS variable names → "_"
+SAFE_ID_TABLE = str.maketrans("- .", "___")
 
-    # Group points by track
-    track_groups = defaultdict(list)
-    for p in points:
-        track_groups[p["video_name"]].append(p)
+# Per-point JS fragments (printf-style, formatted in bulk with map); the
+# "lat,lon" text of each point is formatted once and reused by all of them
+JS_ITEM_SEPARATOR = ",\n        "
+COORDS_JS = "%.6f,%.6f"
+PATH_POINT_JS = "[%s]"
+# Point data only: pointLayer() in the page builds the markers and renders
+# each popup when it is first opened
+POINT_MARKER_JS = "[%s,'%s',%.2f,'%s','%s']"
 
-    # Sort each track by frame index if possible
-    for pts in track_groups.values():
-        pts.sort(key=lambda p: p["frame_index"] if p["frame_index"] is not None else 0)
+# Heat data is embedded as one flat typed array (lat, lon, weight, lat, ...)
+# and unpacked into triples by heatPoints() in the page
+HEAT_ITEM_SEPARATOR = ","
+HEAT_POINT_JS = "%s,%.4f"
 
-    # Global min/max health
-    health_values = [p["health"] for p in points]
-    min_health = min(health_values)
-    max_health = max(health_values)
+# Marker grid cell in degrees (~1 m): a hovering drone records many frames
+# at the same spot, so each track keeps one marker per cell
+MARKER_CELL_SIZE = 1e-5
 
-    # ================
-    # Global heatmap
-    # ================
-    global_heat_js = ",\n        ".join(
-        f"[{p['lat']:.6f}, {p['lon']:.6f}, {(p['health'] / 100.0):.4f}]"
-        for p in points
-    )
-
-    # Per-track JS
-    track_layers_js = []
-    overlays_entries = [
-        # global heatmap added later
-    ]
-
-    for track_id, pts in track_groups.items():
-        safe_id = track_id.replace("-", "_").replace(" ", "_").replace(".", "_")
+def first_point_per_cell(lats, lons, cell_size=MARKER_CELL_SIZE):
+    """
+    Returns the indices of the first point falling in each cell of a
+    cell_size x cell_size degree grid (in point order).
+    """
+    seen = set()
+    kept = []
+    for i, cell in enumerate(zip([lat // cell_size for lat in lats],
+                                 [lon // cell_size for lon in lons])):
+        if cell not in seen:
+            seen.add(cell)
+            kept.append(i)
+    return kept
+
+def build_track_js(track_id, track_columns, min_health, max_health):
+    """
+    Builds the JS section of one track (heatmap, points, polyline, bounds).
+    track_columns holds the track's points, already in frame order, as
+    parallel lists: heat fragments, "lat,lon" texts, lat, lon, health, raw
+    frame index and timestamp. Returns (track_js, overlay_entries).
+    """
+    heat_items, coords, lats, lons, healths, frame_indices_raw, timestamps = track_columns
+    safe_id = track_id.translate(SAFE_ID_TABLE)
 
-        # Per-track heat data
-        heat_js = ",\n        ".join(
-            f"[{p['lat']:.6f}, {p['lon']:.6f}, {(p['health'] / 100.0):.4f}]"
-            for p in pts
-        )
+    # Per-track heat data
+    heat_js = HEAT_ITEM_SEPARATOR.join(heat_items)
 
-        # Per-track points
-        points_js = ",\n        ".join(
-            f"""L.circleMarker([{p['lat']:.6f}, {p['lon']:.6f}], {{
-                radius: 3,
-                color: '{health_to_color(p['health'], min_health, max_health)}',
-                fillColor: '{health_to_color(p['health'], min_health, max_health)}',
-                fillOpacity: 0.9,
-                weight: 0.5
-            }}).bindPopup('Track: {track_id}<br>Health: {p['health']:.2f}%<br>Frame: {p['frame_index_raw']}<br>Timestamp: {p['timestamp']}')"""
-            for p in pts
-        )
+    # Per-track points: one marker per grid cell (heat and path keep every
+    # point), one color lookup per marker used for stroke and fill
+    kept = first_point_per_cell(lats, lons)
+    marker_healths = [healths[i] for i in kept]
+    colors = [health_to_color(health, min_health, max_health) for health in marker_healths]
+    marker_values = zip([coords[i] for i in kept], colors, marker_healths,
+                        [frame_indices_raw[i] for i in kept], [timestamps[i] for i in kept])
+    points_js = JS_ITEM_SEPARATOR.join(map(mod, repeat(POINT_MARKER_JS), marker_values))
 
-        # Per-track polyline (long way of the flight)
-        poly_coords_js = ",\n        ".join(
-            f"[{p['lat']:.6f}, {p['lon']:.6f}]" for p in pts
-        )
+    # Per-track polyline (long way of the flight)
+    poly_coords_js = JS_ITEM_SEPARATOR.join(map(mod, repeat(PATH_POINT_JS), coords))
 
-        track_layers_js.append(f"""
+    track_js = f"""
         // --- Track: {track_id} ---
         var heat_{safe_id} = L.heatLayer(
-          [{heat_js}],
+          heatPoints(new Float64Array([{heat_js}])),
           {{
             radius: 25,
             blur: 30,
@@ -174,7 +221,7 @@ def build_map_html(points, bounds, output_path: Path):
           }}
         );
 
-        var pontos_{safe_id} = L.layerGroup([{points_js}]);
+        var pontos_{safe_id} = pointLayer('{track_id}', [{points_js}]);
 
         var path_{safe_id} = L.polyline(
           [{poly_coords_js}],
@@ -184,15 +231,73 @@ def build_map_html(points, bounds, output_path: Path):
             opacity: 0.8
           }}
         );
-        """)
 
-        overlays_entries.append(f"'Heatmap {track_id}': heat_{safe_id}")
-        overlays_entries.append(f"'Points {track_id}': pontos_{safe_id}")
-        overlays_entries.append(f"'Path {track_id} (Polyline)': path_{safe_id}")
+        var bounds_{safe_id} = L.latLngBounds(
+          [{min(lats):.6f}, {min(lons):.6f}],
+          [{max(lats):.6f}, {max(lons):.6f}]
+        );
+        heat_{safe_id}.trackBounds = bounds_{safe_id};
+        pontos_{safe_id}.trackBounds = bounds_{safe_id};
+        path_{safe_id}.trackBounds = bounds_{safe_id};
+        """
+
+    overlay_entries = [
+        f"'Heatmap {track_id}': heat_{safe_id}",
+        f"'Points {track_id}': pontos_{safe_id}",
+        f"'Path {track_id} (Polyline)': path_{safe_id}",
+    ]
+    return track_js, overlay_entries
+
+def build_map_html(points, bounds, output_path: Path):
+    center_lat = bounds["center_lat"]
+    center_lon = bounds["center_lon"]
+
+    lats = points["lat"]
+    lons = points["lon"]
+    healths = points["health"]
+    frame_indices = points["frame_index"]
+    frame_indices_raw = points["frame_index_raw"]
+    timestamps = points["timestamp"]
 
-    overlays_js = ",\n        ".join(overlays_entries)
+    # Group point indices by track
+    track_groups = defaultdict(list)
+    for i, video_name in enumerate(points["video_name"]):
+        track_groups[video_name].append(i)
 
-    html = f"""<!DOCTYPE html>
+    # Sort each track by frame index if possible (keys computed once,
+    # missing frame indices sort as 0)
+    frame_keys = [0 if frame_index is None else frame_index for frame_index in frame_indices]
+    for idx in track_groups.values():
+        idx.sort(key=frame_keys.__getitem__)
+
+    # Global min/max health
+    min_health = min(healths)
+    max_health = max(healths)
+
+    # Coordinates and heat fragments are formatted once per point and
+    # shared by the global layer and the per-track layers
+    heat_weights = [health / 100.0 for health in healths]
+    coords = list(map(mod, repeat(COORDS_JS), zip(lats, lons)))
+    heat_items = list(map(mod, repeat(HEAT_POINT_JS), zip(coords, heat_weights)))
+
+    # ================
+    # Global heatmap
+    # ================
+    global_heat_js = HEAT_ITEM_SEPARATOR.join(heat_items)
+
+    # Per-track JS (see build_track_js), built lazily in track order
+    track_columns = (
+        ([heat_items[i] for i in idx], [coords[i] for i in idx],
+         [lats[i] for i in idx], [lons[i] for i in idx], [healths[i] for i in idx],
+         [frame_indices_raw[i] for i in idx], [timestamps[i] for i in idx])
+        for idx in track_groups.values()
+    )
+    sections = map(build_track_js, track_groups, track_columns,
+                   repeat(min_health), repeat(max_health))
+
+    # The page is written in sections (the per-point JS is never copied
+    # into one big string with the template)
+    html_head = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="utf-8"/>
@@ -262,31 +367,66 @@ def build_map_html(points, bounds, output_path: Path):
     }}
   );
 
+  // Unpacks flat heat data into the [lat, lon, weight] triples of L.heatLayer
+  function heatPoints(flat) {{
+    var triples = new Array(flat.length / 3);
+    for (var i = 0, j = 0; j < flat.length; i++, j += 3) {{
+      triples[i] = [flat[j], flat[j + 1], flat[j + 2]];
+    }}
+    return triples;
+  }}
+
+  // Builds a track's point layer from [lat, lon, color, health, frame, timestamp]
+  // rows; popups are rendered when first opened
+  function pointLayer(track, rows) {{
+    return L.layerGroup(rows.map(function (p) {{
+      return L.circleMarker([p[0], p[1]], {{
+        radius: 3,
+        color: p[2],
+        fillColor: p[2],
+        fillOpacity: 0.9,
+        weight: 0.5
+      }}).bindPopup(function () {{
+        return 'Track: ' + track + '<br>Health: ' + p[3].toFixed(2) + '%<br>Frame: ' + p[4] + '<br>Timestamp: ' + p[5];
+      }});
+    }}));
+  }}
+
   // Global heatmap (all tracks)
   var heat_all = L.heatLayer(
-    [{global_heat_js}],
-    {{
+    heatPoints(new Float64Array(["""
+    html_middle = """])),
+    {
       radius: 28,
       blur: 32,
       maxZoom: 19,
       minOpacity: 0.35
-    }}
+    }
   );
 
-  {''.join(track_layers_js)}
+  """
+    html_overlays = """
 
-  var baseLayers = {{
+  var baseLayers = {
     "OSM Map": osm,
     "Satellite (World Imagery)": satellite
-  }};
+  };
 
-  var overlays = {{
+  var overlays = {
     "Global Heatmap (All Tracks)": heat_all,
-    {overlays_js}
+    """
+    html_tail = f"""
   }};
 
   L.control.layers(baseLayers, overlays, {{collapsed:false}}).addTo(map);
 
+  // Zoom to a track when one of its layers is switched on
+  map.on('overlayadd', function (e) {{
+    if (e.layer.trackBounds) {{
+      map.fitBounds(e.layer.trackBounds.pad(0.05));
+    }}
+  }});
+
   // Fit bounds to all data
   var bounds = L.latLngBounds(
     [{bounds['min_lat']:.6f}, {bounds['min_lon']:.6f}],
@@ -298,8 +438,21 @@ def build_map_html(points, bounds, output_path: Path):
 </html>
 """
     output_path.parent.mkdir(exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(html_head)
+        f.write(global_heat_js)
+        f.write(html_middle)
+
+        # Track sections are written as they come, so only the overlay
+        # entries are kept until the end
+        overlays_entries = []
+        for track_js, entries in sections:
+            f.write(track_js)
+            overlays_entries.extend(entries)
+
+        f.write(html_overlays)
+        f.write(",\n        ".join(overlays_entries))
+        f.write(html_tail)
     print(f"✅ Analytical map created: {output_path}")
 
 # ---------------------------
@@ -313,7 +466,7 @@ def main():
         print(f"❌ CSV not found: {csv_path}")
         return
     points = load_metadata_with_health(csv_path)
-    if not points:
+    if not points["lat"]:
         print("❌ No points loaded (check CSV columns: latitude, longitude, health_index, video_name/frame_index)")
         return
     bounds = calculate_bounds(points)
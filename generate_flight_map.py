@@ -6,82 +6,199 @@ Uses only standard libraries and reads all_metadata_consolidated.csv.
 
 import csv
 import json
+import math
+from array import array
+from operator import itemgetter
 from pathlib import Path
 from statistics import mean
 
 
+# Point fields only shown in marker popups (embedded for the marker points)
+MARKER_FIELDS = ("relative_altitude", "frame_index", "timestamp", "iso",
+                 "shutter", "aperture")
+
+# Coordinates are embedded as integer offsets from the south-west corner of
+# the bounds, in millionths of a degree (~0.1 m)
+COORD_SCALE = 1_000_000
+
+# Marker grid cell in degrees (~1 m): a hovering drone records many frames
+# at the same spot, so each flight keeps one marker per cell
+MARKER_CELL_SIZE = 1e-5
+
+# Columns read from the CSV: the track name, the coordinates (embedded for
+# every point) and MARKER_FIELDS (embedded for the marker points only)
+LOADED_FIELDS = ("video_name", "latitude", "longitude") + MARKER_FIELDS
+
+
+def new_point_columns():
+    """
+    Empty point store: float arrays for latitude/longitude, lists for the
+    rest (relative_altitude is None when unknown).
+    """
+    return {
+        "video_name": [],
+        "latitude": array("d"),
+        "longitude": array("d"),
+        "relative_altitude": [],
+        "frame_index": [],
+        "timestamp": [],
+        "iso": [],
+        "shutter": [],
+        "aperture": [],
+    }
+
+
 def load_metadata(csv_path):
-    """Reads the consolidated CSV and returns a list of dictionaries with converted types."""
-    rows = []
+    """
+    Reads the consolidated CSV and returns the points as columns
+    (a dictionary of parallel arrays, see new_point_columns).
+    """
+    points = new_point_columns()
+    videos, lats, lons, rel_alts, frames, timestamps, isos, shutters, apertures = (
+        points[field] for field in LOADED_FIELDS
+    )
     with open(csv_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        n_cols = len(header)
+        columns = {name: i for i, name in enumerate(header)}
+
+        # Positional access with a single itemgetter call: missing columns
+        # point to a None slot appended after the last column (a missing
+        # video_name to an "unknown" slot right after it)
+        slots = {"video_name": n_cols + 1}
+        project = itemgetter(*(columns.get(col, slots.get(col, n_cols)) for col in LOADED_FIELDS))
+
         for row in reader:
+            if not row:
+                continue
+            if len(row) != n_cols:
+                row = (row + [None] * n_cols)[:n_cols]
+            row.extend((None, "unknown"))
+
+            video_name, latitude, longitude, rel_alt, frame_index, timestamp, iso, shutter, aperture = project(row)
             try:
-                latitude = float(row.get("latitude", "") or 0)
-                longitude = float(row.get("longitude", "") or 0)
+                latitude = float(latitude or 0)
+                longitude = float(longitude or 0)
             except ValueError:
                 continue
 
             try:
-                rel_alt = float(row.get("relative_altitude", "") or 0)
+                rel_alt = float(rel_alt or 0)
             except ValueError:
                 rel_alt = None
 
-            rows.append(
-                {
-                    "video_name": row.get("video_name", "unknown"),
-                    "frame_index": row.get("frame_index"),
-                    "timestamp": row.get("timestamp"),
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "relative_altitude": rel_alt,
-                    "absolute_altitude": row.get("absolute_altitude"),
-                    "iso": row.get("iso"),
-                    "shutter": row.get("shutter"),
-                    "aperture": row.get("aperture"),
-                    "ev": row.get("ev"),
-                    "color_mode": row.get("color_mode"),
-                    "focal_length": row.get("focal_length"),
-                    "color_temperature": row.get("color_temperature"),
-                }
-            )
-    return rows
-
-
-def group_by_video(rows):
-    """Groups all rows by their corresponding video_name and sorts each flight by frame_index."""
+            videos.append(video_name)
+            lats.append(latitude)
+            lons.append(longitude)
+            rel_alts.append(rel_alt)
+            frames.append(frame_index)
+            timestamps.append(timestamp)
+            isos.append(iso)
+            shutters.append(shutter)
+            apertures.append(aperture)
+    return points
+
+
+def group_by_video(points):
+    """
+    Groups the point indices by their corresponding video_name and sorts
+    each flight by frame_index.
+    """
     grouped = {}
-    for row in rows:
-        grouped.setdefault(row["video_name"], []).append(row)
+    for i, video_name in enumerate(points["video_name"]):
+        grouped.setdefault(video_name, []).append(i)
 
-    # Sort each flight by frame_index
-    for rows in grouped.values():
-        rows.sort(key=lambda r: int(r["frame_index"]) if r["frame_index"] else 0)
+    # Sort each flight by frame_index (stable; keys converted once, no
+    # per-comparison lambda)
+    frame_keys = [int(frame) if frame else 0 for frame in points["frame_index"]]
+    for indices in grouped.values():
+        indices.sort(key=frame_keys.__getitem__)
 
     return grouped
 
 
+def calculate_extents(points):
+    """
+    Returns the bounds [[min_lat, min_lon], [max_lat, max_lon]] and the
+    relative altitude range (0.0 when no altitude is known) in one pass.
+    """
+    lats = points["latitude"]
+    lons = points["longitude"]
+    min_lat = max_lat = lats[0]
+    min_lon = max_lon = lons[0]
+    min_alt = max_alt = None
+
+    for lat, lon, alt in zip(lats, lons, points["relative_altitude"]):
+        if lat < min_lat:
+            min_lat = lat
+        elif lat > max_lat:
+            max_lat = lat
+        if lon < min_lon:
+            min_lon = lon
+        elif lon > max_lon:
+            max_lon = lon
+
+        if alt is None:
+            continue
+        if min_alt is None:
+            min_alt = max_alt = alt
+        elif alt < min_alt:
+            min_alt = alt
+        elif alt > max_alt:
+            max_alt = alt
+
+    bounds = [[min_lat, min_lon], [max_lat, max_lon]]
+    if min_alt is None:
+        return bounds, 0.0, 0.0
+    return bounds, min_alt, max_alt
+
+
+def first_point_per_cell(lats, lons, cell_size=MARKER_CELL_SIZE):
+    """
+    Returns the indices of the first point falling in each cell of a
+    cell_size x cell_size degree grid (in point order).
+    """
+    seen = set()
+    kept = []
+    for i, cell in enumerate(zip([lat // cell_size for lat in lats],
+                                 [lon // cell_size for lon in lons])):
+        if cell not in seen:
+            seen.add(cell)
+            kept.append(i)
+    return kept
+
+
+def gradient_color(ratio):
+    """Returns the hex color of a ratio (0–1) on the blue-to-red gradient."""
+    # Gradient from blue (#2c7bb6) to red (#d73027)
+    start = (44, 123, 182)
+    end = (215, 48, 39)
+
+    r = int(start[0] + (end[0] - start[0]) * ratio)
+    g = int(start[1] + (end[1] - start[1]) * ratio)
+    b = int(start[2] + (end[2] - start[2]) * ratio)
+
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# Gradient precomputed at 256 levels (finer than the eye can tell apart)
+COLOR_LUT_MAX = 255
+COLOR_LUT = [gradient_color(i / COLOR_LUT_MAX) for i in range(COLOR_LUT_MAX + 1)]
+
+
 def altitude_to_color(value, min_alt, max_alt):
     """Returns a hex color based on relative altitude using a blue-to-red gradient."""
-    if value is None or min_alt is None or max_alt is None:
+    if value is None or min_alt is None or max_alt is None or not math.isfinite(value):
         return "#888888"
 
     if max_alt == min_alt:
         ratio = 0.5
     else:
         ratio = (value - min_alt) / (max_alt - min_alt)
-
     ratio = max(0.0, min(1.0, ratio))
 
-    # Gradient from blue (#2c7bb6) to red (#d73027)
-    start = (44, 123, 182)
-    end = (215, 48, 39)
-
-    r = int(start[0] + (end[0] - start[0]) * ratio)
-    g = int(start[1] + (end[1] - start[1]) * ratio)
-    b = int(start[2] + (end[2] - start[2]) * ratio)
-
-    return f"#{r:02x}{g:02x}{b:02x}"
+    return COLOR_LUT[int(ratio * COLOR_LUT_MAX + 0.5)]
 
 
 def build_map_html(flights, bounds, output_path):
@@ -89,6 +206,9 @@ def build_map_html(flights, bounds, output_path):
     center_lat = mean([bounds[0][0], bounds[1][0]])
     center_lon = mean([bounds[0][1], bounds[1][1]])
 
+    # Compact JSON payload embedded in the page (no whitespace)
+    flights_json = json.dumps(flights["data"], separators=(",", ":"))
+
     html_template = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -139,18 +259,23 @@ def build_map_html(flights, bounds, output_path):
       attribution: '&copy; OpenStreetMap contributors'
     }}).addTo(map);
 
-    const flights = {json.dumps(flights['data'])};
+    const flights = {flights_json};
 
     const palette = ["#e41a1c","#377eb8","#4daf4a","#984ea3","#ff7f00",
                      "#ffff33","#a65628","#f781bf","#999999","#66c2a5",
                      "#fc8d62","#8da0cb","#e78ac3","#a6d854","#ffd92f"];
 
+    // Each point gets a single marker, shared by both overlays and
+    // restyled with the color of the active one (altitude wins if both are on)
     const colorByFlight = L.layerGroup().addTo(map);
     const colorByAltitude = L.layerGroup();
+    const pointMarkers = L.layerGroup().addTo(map);
 
     flights.forEach((flight, idx) => {{
       const color = palette[idx % palette.length];
-      const coords = flight.points.map(p => [p.latitude, p.longitude]);
+      const latitudes = flight.latitude.map(q => bounds[0][0] + q / {COORD_SCALE});
+      const longitudes = flight.longitude.map(q => bounds[0][1] + q / {COORD_SCALE});
+      const coords = latitudes.map((latitude, i) => [latitude, longitudes[i]]);
 
       L.polyline(coords, {{
         color: color,
@@ -158,34 +283,52 @@ def build_map_html(flights, bounds, output_path):
         opacity: 0.8
       }}).addTo(colorByFlight);
 
-      flight.points.forEach(point => {{
-        const popupHtml = `
+      // Points are stored column-wise (one array per field); markers go
+      // to one point per grid cell (the polyline keeps every point, the
+      // popup columns hold marker k at position k) and popups are
+      // rendered when first opened
+      flight.marker_index.forEach((i, k) => {{
+        const latitude = latitudes[i];
+        const longitude = longitudes[i];
+        const popupHtml = () => `
           <strong>${{flight.video_name}}</strong><br/>
-          Frame: ${{point.frame_index}}<br/>
-          Timestamp: ${{point.timestamp}}<br/>
-          Lat/Lon: ${{point.latitude.toFixed(6)}}, ${{point.longitude.toFixed(6)}}<br/>
-          Rel. Altitude: ${{point.relative_altitude ?? 'N/A'}} m<br/>
-          ISO: ${{point.iso}} | Shutter: ${{point.shutter}} | f/${{point.aperture}}
+          Frame: ${{flight.frame_index[k]}}<br/>
+          Timestamp: ${{flight.timestamp[k]}}<br/>
+          Lat/Lon: ${{latitude.toFixed(6)}}, ${{longitude.toFixed(6)}}<br/>
+          Rel. Altitude: ${{flight.relative_altitude[k] ?? 'N/A'}} m<br/>
+          ISO: ${{flight.iso[k]}} | Shutter: ${{flight.shutter[k]}} | f/${{flight.aperture[k]}}
         `;
 
-        L.circleMarker([point.latitude, point.longitude], {{
+        L.circleMarker([latitude, longitude], {{
           radius: 4,
           color: color,
           fillColor: color,
           fillOpacity: 0.8,
-          weight: 1
-        }}).bindPopup(popupHtml).addTo(colorByFlight);
-
-        L.circleMarker([point.latitude, point.longitude], {{
-          radius: 4,
-          color: point.altitude_color,
-          fillColor: point.altitude_color,
-          fillOpacity: 0.85,
-          weight: 1
-        }}).bindPopup(popupHtml).addTo(colorByAltitude);
+          weight: 1,
+          flightColor: color,
+          altitudeColor: flight.altitude_color[k]
+        }}).bindPopup(popupHtml).addTo(pointMarkers);
       }});
     }});
 
+    function updatePointMarkers() {{
+      const byAltitude = map.hasLayer(colorByAltitude);
+      if (!byAltitude && !map.hasLayer(colorByFlight)) {{
+        map.removeLayer(pointMarkers);
+        return;
+      }}
+      pointMarkers.eachLayer(marker => {{
+        const markerColor = byAltitude ? marker.options.altitudeColor : marker.options.flightColor;
+        marker.setStyle({{
+          color: markerColor,
+          fillColor: markerColor,
+          fillOpacity: byAltitude ? 0.85 : 0.8
+        }});
+      }});
+      pointMarkers.addTo(map);
+    }}
+    map.on('overlayadd overlayremove', updatePointMarkers);
+
     const overlays = {{
       "Color by Flight": colorByFlight,
       "Color by Altitude": colorByAltitude
@@ -209,50 +352,46 @@ def main():
     if not csv_path.exists():
         raise FileNotFoundError(f"Consolidated CSV not found: {csv_path}")
 
-    rows = load_metadata(csv_path)
-    if not rows:
+    points = load_metadata(csv_path)
+    if not points["latitude"]:
         raise RuntimeError("No data available to generate the map.")
 
-    all_lats = [r["latitude"] for r in rows]
-    all_lons = [r["longitude"] for r in rows]
-
-    bounds = [
-        [min(all_lats), min(all_lons)],
-        [max(all_lats), max(all_lons)],
-    ]
-
-    altitudes = [r["relative_altitude"] for r in rows if r["relative_altitude"] is not None]
-    min_alt = min(altitudes) if altitudes else 0.0
-    max_alt = max(altitudes) if altitudes else 0.0
+    bounds, min_alt, max_alt = calculate_extents(points)
 
-    grouped = group_by_video(rows)
+    grouped = group_by_video(points)
 
     flight_payload = {
         "data": [],
         "altitude_range": {"min": min_alt, "max": max_alt},
     }
 
-    for video_name, points in grouped.items():
-        flight_points = []
-        for point in points:
-            color = altitude_to_color(point["relative_altitude"], min_alt, max_alt)
-            flight_points.append(
-                {
-                    "latitude": point["latitude"],
-                    "longitude": point["longitude"],
-                    "relative_altitude": point["relative_altitude"],
-                    "frame_index": point["frame_index"],
-                    "timestamp": point["timestamp"],
-                    "iso": point["iso"],
-                    "shutter": point["shutter"],
-                    "aperture": point["aperture"],
-                    "altitude_color": color,
-                }
-            )
-
-        flight_payload["data"].append(
-            {"video_name": video_name, "points": flight_points}
-        )
+    # Each flight is embedded column-wise: field names are written once
+    # per flight instead of once per point
+    for video_name, indices in grouped.items():
+        flight = {"video_name": video_name}
+        lats = points["latitude"]
+        lons = points["longitude"]
+        flight["latitude"] = [lats[i] for i in indices]
+        flight["longitude"] = [lons[i] for i in indices]
+
+        # Points that get a marker (see MARKER_CELL_SIZE); only the polyline
+        # needs every point, so the popup columns keep the marker points only
+        marker_index = first_point_per_cell(flight["latitude"], flight["longitude"])
+        flight["marker_index"] = marker_index
+        marker_points = [indices[i] for i in marker_index]
+        for field in MARKER_FIELDS:
+            column = points[field]
+            flight[field] = [column[i] for i in marker_points]
+
+        # Quantized coordinates (see COORD_SCALE)
+        origin_lat, origin_lon = bounds[0]
+        flight["latitude"] = [round((lat - origin_lat) * COORD_SCALE) for lat in flight["latitude"]]
+        flight["longitude"] = [round((lon - origin_lon) * COORD_SCALE) for lon in flight["longitude"]]
+        flight["altitude_color"] = [
+            altitude_to_color(altitude, min_alt, max_alt)
+            for altitude in flight["relative_altitude"]
+        ]
+        flight_payload["data"].append(flight)
 
     output_dir = base_dir / "maps"
     output_dir.mkdir(exist_ok=True)
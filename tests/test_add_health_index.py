@@ -0,0 +1,26 @@
+import contextlib
+import io
+import unittest
+
+from add_health_index import iter_row_chunks
+
+
+class IterRowChunksTest(unittest.TestCase):
+    def rows(self, lines):
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = list(iter_row_chunks(lines, 3, 1, 2, None))
+        return [line for chunk in chunks for line in chunk[0]]
+
+    def test_short_rows_are_padded(self):
+        self.assertEqual(self.rows([b"1,50.1"]), [b"1,50.1,"])
+
+    def test_rows_with_extra_fields_are_skipped(self):
+        self.assertEqual(self.rows([b"1,50.1,11.9,extra", b"2,50.2,11.8"]), [b"2,50.2,11.8"])
+
+    def test_non_finite_coordinates_are_skipped(self):
+        lines = [b"1,nan,11.9", b"2,50.2,inf", b"3,50.3,11.7"]
+        self.assertEqual(self.rows(lines), [b"3,50.3,11.7"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import create_consolidated_csv
+from create_consolidated_csv import FIELDNAMES, read_csv_file
+
+
+class ReadCsvFileTest(unittest.TestCase):
+    def read(self, text):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "flight_metadata.csv"
+            path.write_text(text, encoding="utf-8")
+            return read_csv_file(path)
+
+    def test_blank_lines_are_skipped(self):
+        rows = self.read(
+            "frame_index,latitude,longitude\n"
+            "1,50.1,11.9\n"
+            "\n"
+            "2,50.2,11.8\n"
+            "\n"
+        )
+        frame_col = FIELDNAMES.index("frame_index")
+        self.assertEqual([row[frame_col] for row in rows], ["1", "2"])
+
+    def test_missing_columns_and_short_rows_are_empty(self):
+        rows = self.read("frame_index,latitude,longitude\n3,50.3\n")
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(len(row), len(FIELDNAMES))
+        self.assertEqual(row[FIELDNAMES.index("latitude")], "50.3")
+        self.assertEqual(row[FIELDNAMES.index("longitude")], "")
+        self.assertEqual(row[FIELDNAMES.index("iso")], "")
+
+
+class CreateConsolidatedCsvTest(unittest.TestCase):
+    def test_header_only_files_are_not_counted_as_videos(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            base_dir = Path(tmp) / "extracted_metadata"
+            for video, body in (("A", "1,50.1,11.9\n"), ("B", "")):
+                video_dir = base_dir / video
+                video_dir.mkdir(parents=True)
+                (video_dir / f"{video}_metadata.csv").write_text(
+                    "frame_index,latitude,longitude\n" + body, encoding="utf-8"
+                )
+
+            module_file = str(Path(tmp) / "create_consolidated_csv.py")
+            with mock.patch.object(create_consolidated_csv, "__file__", module_file), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                create_consolidated_csv.create_consolidated_csv()
+
+            report = (base_dir / "statistics_summary.txt").read_text(encoding="utf-8")
+        self.assertIn("Total videos: 1\n", report)
+        self.assertIn("A: 1 frames\n", report)
+        self.assertNotIn("B:", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from extract_srt_metadata import extract_frame_info, parse_metadata_line
+
+STANDARD_LINE = (
+    "[iso: 100] [shutter: 1/500.0] [fnum: 1.7] [ev: 0] [color_md: default] "
+    "[focal_len: 24.00] [latitude: 50.328847] [longitude: 11.938927] "
+    "[rel_alt: 2.200 abs_alt: 553.990] [ct: 5300]"
+)
+
+
+def frame_block(metadata_line):
+    return [
+        "1",
+        "00:00:00,000 --> 00:00:00,033",
+        '<font size="28">FrameCnt: 1, DiffTime: 33ms',
+        "2025-11-14 09:15:04.416",
+        metadata_line + "</font>",
+    ]
+
+
+class ParseMetadataLineTest(unittest.TestCase):
+    def test_standard_line(self):
+        metadata = parse_metadata_line(STANDARD_LINE)
+        self.assertEqual(metadata["latitude"], "50.328847")
+        self.assertEqual(metadata["relative_altitude"], "2.200")
+        self.assertEqual(metadata["absolute_altitude"], "553.990")
+        self.assertEqual(metadata["aperture"], "1.7")
+
+    def test_other_field_order(self):
+        metadata = parse_metadata_line("[longitude: 11.9] [ct: 5300] [latitude: 50.3]")
+        self.assertEqual(metadata, {"latitude": "50.3", "longitude": "11.9",
+                                    "color_temperature": "5300"})
+
+    def test_invalid_values_are_left_out(self):
+        metadata = parse_metadata_line(STANDARD_LINE.replace("[iso: 100]", "[iso: abc]"))
+        self.assertNotIn("iso", metadata)
+        self.assertEqual(metadata["latitude"], "50.328847")
+
+    def test_negative_coordinates_drop_the_frame(self):
+        for old, new in (("50.328847", "-33.5"), ("11.938927", "-11.94")):
+            line = STANDARD_LINE.replace(old, new)
+            self.assertIsNone(extract_frame_info(frame_block(line)))
+
+    def test_valid_frame(self):
+        frame = extract_frame_info(frame_block(STANDARD_LINE))
+        self.assertEqual(frame["frame_index"], 1)
+        self.assertEqual(frame["timestamp"], "2025-11-14 09:15:04.416")
+
+
+if __name__ == "__main__":
+    unittest.main()